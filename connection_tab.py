@@ -2,15 +2,29 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
 import queue
+import time
+from metrics import REGISTRY
+from profiler import stage as profile_stage
+from port_scanner import PortScanner, PortMonitor
 
-try:
-    import serial
-    import serial.tools.list_ports
-except ImportError:
-    serial = None
+# pyserial is imported on first connect; port enumeration runs in PortScanner
+serial = None
+
+LINES_READ = REGISTRY.counter("serial_lines_read_total", "Lines read from the serial port")
+BYTES_READ = REGISTRY.counter("serial_bytes_read_total", "Bytes read from the serial port")
+READ_ERRORS = REGISTRY.counter("serial_read_errors_total", "Exceptions raised by readline()")
+LINK_UP = REGISTRY.gauge("serial_link_up", "1 while the serial port is open and healthy")
+DISCONNECTS = REGISTRY.counter("serial_disconnects_total", "Unexpected losses of the serial port")
+RECONNECTS = REGISTRY.counter("serial_reconnects_total", "Successful automatic reconnects")
 
 
 class ConnectionTab:
+    PORT_POLL_MS = 500  # ms between checks of the cached port list
+    LINK_CHECK_S = 1.0  # seconds between adapter presence checks in the reader
+    MAX_READ_ERRORS = 3  # consecutive readline() failures treated as a lost link
+    RECONNECT_MIN_S = 0.5
+    RECONNECT_MAX_S = 30.0
+
     def __init__(self, notebook, run_tab_ref):
         self.frame = ttk.Frame(notebook)
         self.serial_conn = None
@@ -24,15 +38,31 @@ class ConnectionTab:
         self.reader_thread = None
         self.stop_reader = False
 
+        self.port_scanner = PortScanner().start()
+        self._ports_version = -1
+
+        # Hot-plug recovery
+        self.monitor = None                  # PortMonitor for the connected adapter
+        self.baudrate = None
+        self.link_up = threading.Event()     # set while serial_conn is usable
+        self.auto_reconnect = False          # False after a user disconnect
+        self._stop_reconnect = threading.Event()
+        self._link_lock = threading.Lock()
+        self._session = 0                    # bumped per connect/disconnect; stale reconnects exit
+
         # --- UI elements ---
         ttk.Label(self.frame, text="Select Port:").pack(pady=5)
 
         self.port_var = tk.StringVar()
         self.port_dropdown = ttk.Combobox(
-            self.frame, textvariable=self.port_var, width=32, state="readonly"
+            self.frame, textvariable=self.port_var, width=32, state="readonly",
+            values=["Scanning..."]
         )
-        self._refresh_ports()
+        self.port_dropdown.current(0)
         self.port_dropdown.pack(pady=5)
+        ttk.Button(
+            self.frame, text="Refresh Ports", command=self.port_scanner.refresh
+        ).pack(pady=5)
 
         # Baudrate selector
         ttk.Label(self.frame, text="Baudrate:").pack(pady=5)
@@ -58,20 +88,36 @@ class ConnectionTab:
         )
         self.status_label.pack(pady=5)
 
+        self.frame.after(self.PORT_POLL_MS, self._refresh_ports)
+
     def _refresh_ports(self):
-        ports = []
-        if serial:
-            ports = [p.device for p in serial.tools.list_ports.comports()]
-        self.port_dropdown["values"] = ports or ["No ports found"]
-        self.port_dropdown.current(0)
+        """Pick up the scanner's cached list when it changes; never enumerates here."""
+        scanner = self.port_scanner
+        if scanner.scanned and scanner.version != self._ports_version:
+            self._ports_version = scanner.version
+            ports = scanner.devices()
+            current = self.port_var.get()
+            self.port_dropdown["values"] = ports or ["No ports found"]
+            if current in ports:
+                self.port_dropdown.current(ports.index(current))
+            else:
+                self.port_dropdown.current(0)
+        self.frame.after(self.PORT_POLL_MS, self._refresh_ports)
 
     def connect(self):
-        if not serial:
-            messagebox.showerror(
-                "Missing dependency", "pyserial not installed (pip install pyserial)"
-            )
-            return
+        global serial
+        if serial is None:
+            try:
+                import serial
+            except ImportError:
+                messagebox.showerror(
+                    "Missing dependency", "pyserial not installed (pip install pyserial)"
+                )
+                return
         selected = self.port_var.get()
+        if selected == "Scanning...":
+            messagebox.showinfo("Scanning", "Still looking for serial ports, try again in a moment.")
+            return
         if selected == "No ports found":
             messagebox.showerror("No Ports", "No serial ports detected.")
             return
@@ -84,41 +130,144 @@ class ConnectionTab:
             self.connect_button["state"] = "disabled"
             self.disconnect_button["state"] = "normal"
 
+            self.baudrate = baud
+            self.monitor = PortMonitor(self.port_scanner, selected)
+            self.port_scanner.set_auto(False)  # no background comports() during runs
+            self.auto_reconnect = True
+            self._session += 1
+            self._stop_reconnect = threading.Event()
+
             # Start background reader
             self.stop_reader = False
-            self.reader_thread = threading.Thread(
-                target=self._reader_loop, daemon=True
-            )
-            self.reader_thread.start()
+            self._start_reader(self.serial_conn)
         except Exception as e:
             self.serial_conn = None
             messagebox.showerror("Connection Failed", str(e))
 
-    def _reader_loop(self):
+    def _start_reader(self, conn):
+        self.link_up.set()
+        LINK_UP.set(1)
+        self.reader_thread = threading.Thread(
+            target=self._reader_loop, args=(conn,), daemon=True
+        )
+        self.reader_thread.start()
+
+    def is_connected(self):
+        conn = self.serial_conn
+        return self.link_up.is_set() and conn is not None and conn.is_open
+
+    def _reader_loop(self, conn):
         """
         This thread is the ONLY reader of the serial port.
         It pushes every line into shared_queue and logs to RunTab.
+        Exits (and hands over to _reconnect_loop) if the adapter goes away.
         """
-        while not self.stop_reader and self.serial_conn and self.serial_conn.is_open:
+        errors = 0
+        next_check = time.monotonic() + self.LINK_CHECK_S
+        while not self.stop_reader and conn.is_open:
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + self.LINK_CHECK_S
+                if self.monitor and not self.monitor.is_present():
+                    self._link_lost(conn, "adapter disappeared")
+                    return
             try:
-                raw = self.serial_conn.readline()
+                with profile_stage("reader.read"):
+                    raw = conn.readline()
                 if not raw:
                     continue
+                with profile_stage("reader.process"):
+                    BYTES_READ.inc(len(raw))
+                    try:
+                        line = raw.decode(errors="ignore").rstrip("\r\n")
+                    except Exception:
+                        line = str(raw)
+                    if line:
+                        # Save in history
+                        with self.history_lock:
+                            self.history.append(line)
+                        # Push into queue for RunTab polling
+                        self.shared_queue.put(line)
+                        LINES_READ.inc()
+                errors = 0
+            except Exception as e:
+                READ_ERRORS.inc()
+                errors += 1
+                if errors >= self.MAX_READ_ERRORS or (self.monitor and not self.monitor.is_present()):
+                    self._link_lost(conn, str(e) or type(e).__name__)
+                    return
+                time.sleep(0.1)
+
+    # --- Hot-plug recovery ---
+    def report_write_error(self, exc):
+        """Called by RunTab when a write fails; treats it as a lost link."""
+        conn = self.serial_conn
+        if conn is not None:
+            self._link_lost(conn, f"write failed: {exc}")
+
+    def _link_lost(self, conn, reason):
+        with self._link_lock:
+            if conn is not self.serial_conn or not self.link_up.is_set():
+                return  # already being handled
+            self.link_up.clear()
+            LINK_UP.set(0)
+            DISCONNECTS.inc()
+            try:
+                conn.close()
+            except Exception:
+                pass
+            if not self.auto_reconnect:
+                return
+        device = self.monitor.describe() if self.monitor else "port"
+        self._notify(f"[LINK] Lost {device}: {reason}; reconnecting")
+        self._set_status(f"Status: Reconnecting to {device}...", "orange")
+        threading.Thread(
+            target=self._reconnect_loop, args=(self._session, self._stop_reconnect), daemon=True
+        ).start()
+
+    def _reconnect_loop(self, session, stop_event):
+        """Reopen the adapter (same path or same VID:PID) with exponential backoff."""
+        delay = self.RECONNECT_MIN_S
+        while not stop_event.is_set():
+            device = self.monitor.locate()
+            if device:
                 try:
-                    line = raw.decode(errors="ignore").rstrip("\r\n")
+                    conn = serial.Serial(device, baudrate=self.baudrate, timeout=1)
                 except Exception:
-                    line = str(raw)
-                if line:
-                    # Save in history
-                    with self.history_lock:
-                        self.history.append(line)
-                    # Push into queue for RunTab polling
-                    self.shared_queue.put(line)
-            except Exception:
-                continue
+                    conn = None
+                if conn is not None:
+                    with self._link_lock:
+                        if stop_event.is_set() or session != self._session:
+                            conn.close()
+                            return
+                        self.monitor.adopt(device)
+                        self.serial_conn = conn
+                        self._start_reader(conn)
+                    RECONNECTS.inc()
+                    self._notify(f"[LINK] Reconnected to {device}")
+                    self._set_status(f"Status: Connected to {device} @ {self.baudrate}", "green")
+                    return
+            # Adapter may have re-enumerated under a new path (or the cache is
+            # stale off POSIX); refresh on demand, bounded by the backoff
+            self.port_scanner.refresh()
+            stop_event.wait(delay)
+            delay = min(delay * 2, self.RECONNECT_MAX_S)
+
+    def _notify(self, msg):
+        if self.run_tab_ref:
+            self.run_tab_ref.enqueue_log(msg)
+
+    def _set_status(self, text, color):
+        self.frame.after(0, lambda: self.status_label.config(text=text, foreground=color))
 
     def disconnect(self):
+        with self._link_lock:
+            self.auto_reconnect = False
+            self._session += 1
+            self._stop_reconnect.set()
+        self.link_up.clear()
+        LINK_UP.set(0)
         self.stop_reader = True
+        self.port_scanner.set_auto(True)
         if self.reader_thread and self.reader_thread.is_alive():
             try:
                 self.reader_thread.join(timeout=0.2)
@@ -1,18 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+import os
 import json
+from plan_utils import CONTROL_COLS
 
 # All fields required (snake_case)
 REQUIRED_COLS = (
     "command_name", "command", "expected", "regex", "negative",
     "wait_till", "print_after", "print_ahead_chars", "message", "retries"
 )
+# Optional plan controls: parameter tables, range loops, conditions
+OPTIONAL_COLS = CONTROL_COLS
+PLAN_COLS = REQUIRED_COLS + OPTIONAL_COLS
 
 
 class EditorTab:
     def __init__(self, notebook):
         self.frame = ttk.Frame(notebook)
         self.data = []
+        self.plan_dir = None   # folder of the loaded/saved plan; relative 'params' paths resolve here
 
         # --- Buttons ---
         bf = ttk.Frame(self.frame)
@@ -24,8 +30,8 @@ class EditorTab:
         ttk.Button(bf, text="Delete", command=self.delete_row).pack(side="left", padx=5, pady=5)
 
         # --- Table ---
-        self.tree = ttk.Treeview(self.frame, columns=REQUIRED_COLS, show="headings", selectmode="browse")
-        for col in REQUIRED_COLS:
+        self.tree = ttk.Treeview(self.frame, columns=PLAN_COLS, show="headings", selectmode="browse")
+        for col in PLAN_COLS:
             self.tree.heading(col, text=col)
             self.tree.column(col, width=120, stretch=True)
         self.tree.pack(fill="both", expand=True)
@@ -38,14 +44,14 @@ class EditorTab:
         self.edit_frame = ttk.LabelFrame(self.frame, text="Edit Command")
         self.edit_frame.pack(fill="x", pady=6)
 
-        self.edit_vars = {col: tk.StringVar() for col in REQUIRED_COLS}
-        for i, col in enumerate(REQUIRED_COLS):
+        self.edit_vars = {col: tk.StringVar() for col in PLAN_COLS}
+        for i, col in enumerate(PLAN_COLS):
             r, c = divmod(i, 4)  # 4 columns per row
             ttk.Label(self.edit_frame, text=col).grid(row=r, column=c*2, padx=5, pady=4, sticky="e")
             ttk.Entry(self.edit_frame, textvariable=self.edit_vars[col], width=18).grid(row=r, column=c*2+1, padx=5, pady=4, sticky="w")
 
         self.save_edit_btn = ttk.Button(self.edit_frame, text="Save Edit", command=self.save_edit, state="disabled")
-        self.save_edit_btn.grid(row=(len(REQUIRED_COLS)//4)+1, column=0, columnspan=8, pady=6)
+        self.save_edit_btn.grid(row=(len(PLAN_COLS)//4)+1, column=0, columnspan=8, pady=6)
 
         self.dragging_index = None
 
@@ -61,13 +67,14 @@ class EditorTab:
                 raise ValueError("JSON root must be a list of objects.")
             fixed = []
             for item in data:
-                row = {k: "" for k in REQUIRED_COLS}
+                row = {k: "" for k in PLAN_COLS}
                 if isinstance(item, dict):
-                    for k in REQUIRED_COLS:
+                    for k in PLAN_COLS:
                         if k in item:
                             row[k] = str(item[k])
                 fixed.append(row)
             self.data = fixed
+            self.plan_dir = os.path.dirname(os.path.abspath(file_path))
             self.refresh_table()
             messagebox.showinfo("Loaded", f"Loaded {len(self.data)} commands.")
         except Exception as e:
@@ -79,6 +86,7 @@ class EditorTab:
             return
         with open(file_path, "w", encoding="utf-8") as f:
             json.dump(self.data, f, indent=2)
+        self.plan_dir = os.path.dirname(os.path.abspath(file_path))
         messagebox.showinfo("Saved", f"Commands saved to {file_path}")
 
     # --- Row operations ---
@@ -93,7 +101,10 @@ class EditorTab:
             "print_after": "0",
             "print_ahead_chars": "0",
             "message": "",
-            "retries": "1"
+            "retries": "1",
+            "params": "",
+            "loop": "",
+            "when": ""
         })
         self.refresh_table()
 
@@ -138,7 +149,7 @@ class EditorTab:
         for r in self.tree.get_children():
             self.tree.delete(r)
         for cmd in self.data:
-            self.tree.insert("", "end", values=[cmd.get(c, "") for c in REQUIRED_COLS])
+            self.tree.insert("", "end", values=[cmd.get(c, "") for c in PLAN_COLS])
 
     # --- Drag & drop ---
     def drag(self, event):
@@ -1,8 +1,13 @@
 import os
 import datetime
+import time
 import html
-import webbrowser
 import tkinter.messagebox as messagebox
+from metrics import REGISTRY
+from profiler import record_after_run as profile_record
+
+EXPORT_SECONDS = REGISTRY.histogram("export_seconds", "Time to build and write an HTML report")
+EXPORT_ROWS = REGISTRY.counter("export_rows_total", "Result rows written to HTML reports")
 
 def export_to_html(results, filename="results.html"):
     """
@@ -15,6 +20,8 @@ def export_to_html(results, filename="results.html"):
         messagebox.showerror("No Results", "No results to export.")
         return None
 
+    export_start = time.perf_counter()
+    export_cpu = time.thread_time()
     now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     # CSS Styling
@@ -154,12 +161,17 @@ def export_to_html(results, filename="results.html"):
     # Save file
     with open(filename, "w", encoding="utf-8") as f:
         f.write(html_content)
+    export_wall = time.perf_counter() - export_start
+    EXPORT_SECONDS.observe(export_wall)
+    profile_record("export.html", export_wall, time.thread_time() - export_cpu)
+    EXPORT_ROWS.inc(total)
 
     abs_path = os.path.abspath(filename)
     messagebox.showinfo("Export Complete", f"Results exported to {abs_path}")
 
     # Ask user if they want to open it
     if messagebox.askyesno("Open Report", "Do you want to open the HTML report now?"):
+        import webbrowser  # deferred: only needed when the user opens the report
         webbrowser.open(f"file://{abs_path}")
 
     return filename
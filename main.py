@@ -1,37 +1,101 @@
+import time
+# Taken when main.py starts executing, i.e. after interpreter start-up;
+# time-to-first-frame covers our imports, App construction and first draw
+_START = time.perf_counter()
+
+import sys
 import tkinter as tk
 from tkinter import ttk
 from connection_tab import ConnectionTab
-from editor_tab import EditorTab
-from run_tab import RunTab
+from metrics import REGISTRY
+
+FIRST_FRAME = REGISTRY.gauge(
+    "startup_first_frame_seconds", "Time from main.py starting to execute to the first idle frame"
+)
+STARTUP_TARGET = REGISTRY.gauge("startup_target_seconds", "Time-to-first-frame budget")
+OVER_TARGET = REGISTRY.gauge("startup_over_target", "1 if time to first frame exceeded the budget")
 
 
 class App(tk.Tk):
-    def __init__(self):
+    STARTUP_TARGET_S = 0.5  # time-to-first-frame budget
+    WARMUP_MS = 300         # delay before building the remaining tabs in the background
+
+    def __init__(self, profile=False):
         super().__init__()
         self.title("Serial Test Tool v3.1")
         self.geometry("1200x700")
+        self.profile = profile
+        self._startup_note = None  # logged to the Run tab once it exists
 
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(fill="both", expand=True)
 
-        # Create tabs in correct order and wire them
-        self.editor_tab = EditorTab(self.notebook)
+        # Only the first visible tab is built up front; port enumeration
+        # happens on ConnectionTab's background scanner
+        self.connection_tab = ConnectionTab(self.notebook, None)
+        self.notebook.add(self.connection_tab.frame, text="Connection")
 
-        # RunTab initially without connection_tab
-        self.run_tab = RunTab(self.notebook, self.editor_tab, None)
+        # Other tabs get an empty placeholder and are built on first view
+        self.editor_tab = None
+        self.run_tab = None
+        self.metrics_tab = None
+        self._placeholders = {}
+        for key, text in (("editor", "Editor"), ("run", "Run & Export"), ("metrics", "Metrics")):
+            placeholder = ttk.Frame(self.notebook)
+            self.notebook.add(placeholder, text=text)
+            self._placeholders[key] = placeholder
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
-        # ConnectionTab created with reference to run_tab
-        self.connection_tab = ConnectionTab(self.notebook, self.run_tab)
+        self.after_idle(self._first_frame)
 
-        # Back-fill connection_tab into run_tab
-        self.run_tab.connection_tab = self.connection_tab
+    # --- Startup ---
+    def _first_frame(self):
+        elapsed = time.perf_counter() - _START
+        FIRST_FRAME.set(elapsed)
+        STARTUP_TARGET.set(self.STARTUP_TARGET_S)
+        OVER_TARGET.set(1 if elapsed > self.STARTUP_TARGET_S else 0)
+        if elapsed > self.STARTUP_TARGET_S:
+            self._startup_note = (
+                f"[WARN] Time to first frame {elapsed:.3f}s exceeds target {self.STARTUP_TARGET_S:.3f}s"
+            )
+        # Build the rest while idle so the Run tab drains the serial queue
+        # even if the user never opens it
+        self.after(self.WARMUP_MS, self._warm_up)
 
-        # Add tabs to notebook
-        self.notebook.add(self.connection_tab.frame, text="Connection")
-        self.notebook.add(self.editor_tab.frame, text="Editor")
-        self.notebook.add(self.run_tab.frame, text="Run & Export")
+    def _warm_up(self):
+        for key in ("editor", "run", "metrics"):
+            if getattr(self, f"{key}_tab") is None:
+                self._ensure_tab(key)
+                self.after(self.WARMUP_MS, self._warm_up)  # one tab per idle slot
+                return
+
+    def _on_tab_changed(self, _):
+        selected = self.notebook.nametowidget(self.notebook.select())
+        for key, placeholder in self._placeholders.items():
+            if placeholder is selected:
+                self._ensure_tab(key)
+
+    # --- Lazy tab construction ---
+    def _ensure_tab(self, key):
+        if key == "editor" and self.editor_tab is None:
+            from editor_tab import EditorTab
+            self.editor_tab = EditorTab(self._placeholders["editor"])
+            self.editor_tab.frame.pack(fill="both", expand=True)
+        elif key == "run" and self.run_tab is None:
+            self._ensure_tab("editor")
+            from run_tab import RunTab
+            self.run_tab = RunTab(self._placeholders["run"], self.editor_tab, self.connection_tab)
+            self.run_tab.frame.pack(fill="both", expand=True)
+            self.run_tab.profile_var.set(self.profile)
+            self.connection_tab.run_tab_ref = self.run_tab
+            if self._startup_note:
+                self.run_tab.enqueue_log(self._startup_note)
+        elif key == "metrics" and self.metrics_tab is None:
+            from metrics_tab import MetricsTab
+            self.metrics_tab = MetricsTab(self._placeholders["metrics"])
+            self.metrics_tab.frame.pack(fill="both", expand=True)
 
 
 if __name__ == "__main__":
-    app = App()
+    app = App(profile="--profile" in sys.argv[1:])
     app.mainloop()
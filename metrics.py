@@ -0,0 +1,232 @@
+import os
+import json
+import math
+import threading
+import time
+
+
+class Counter:
+    """Monotonic count (lines read, commands run, ...)."""
+    kind = "counter"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, n=1):
+        with self._lock:
+            self._value += n
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return {"type": self.kind, "value": self._value}
+
+
+class Gauge:
+    """Point-in-time value (queue depth, startup time, ...)."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self._value = 0.0
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return {"type": self.kind, "value": self._value}
+
+
+class Histogram:
+    """
+    HDR-style histogram: log-linear buckets (SUB_BUCKETS per power of two),
+    so memory stays small and relative error stays below ~1/SUB_BUCKETS
+    across microseconds to hours without choosing bucket bounds up front.
+    """
+    kind = "histogram"
+    SUB_BUCKETS = 16
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._buckets = {}   # (exponent, sub_bucket) -> count
+        self._count = 0
+        self._sum = 0.0
+        self._min = math.inf
+        self._max = 0.0
+
+    def _key(self, value):
+        if value <= 0:
+            return None
+        mantissa, exponent = math.frexp(value)   # mantissa in [0.5, 1)
+        return exponent, int((mantissa - 0.5) * 2 * self.SUB_BUCKETS)
+
+    def _upper_bound(self, key):
+        if key is None:
+            return 0.0
+        exponent, sub = key
+        return math.ldexp(0.5 + (sub + 1) / (2 * self.SUB_BUCKETS), exponent)
+
+    def observe(self, value):
+        key = self._key(value)
+        with self._lock:
+            self._buckets[key] = self._buckets.get(key, 0) + 1
+            self._count += 1
+            self._sum += value
+            self._min = min(self._min, value)
+            self._max = max(self._max, value)
+
+    def time(self):
+        """Context manager that observes the elapsed wall time in seconds."""
+        return _Timer(self)
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def sum(self):
+        return self._sum
+
+    def _sorted_buckets(self):
+        with self._lock:
+            items = list(self._buckets.items())
+        # None (zero/negative values) sorts first
+        return sorted(items, key=lambda kv: (-math.inf, 0) if kv[0] is None else kv[0])
+
+    def percentile(self, p):
+        if not self._count:
+            return 0.0
+        target = max(1, math.ceil(self._count * p / 100.0))
+        seen = 0
+        for key, n in self._sorted_buckets():
+            seen += n
+            if seen >= target:
+                return min(self._upper_bound(key), self._max)
+        return self._max
+
+    def cumulative_buckets(self):
+        """[(upper_bound, cumulative_count), ...] for Prometheus 'le' buckets."""
+        out, seen = [], 0
+        for key, n in self._sorted_buckets():
+            seen += n
+            out.append((self._upper_bound(key), seen))
+        return out
+
+    def snapshot(self):
+        return {
+            "type": self.kind,
+            "count": self._count,
+            "sum": self._sum,
+            "min": self._min if self._count else 0.0,
+            "max": self._max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class _Timer:
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get(self, cls, name, help_text):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' already registered as {metric.kind}.")
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name, help_text=""):
+        return self._get(Histogram, name, help_text)
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda m: m.name)
+
+    # --- Export ---
+    def snapshot(self):
+        return {
+            "timestamp": time.time(),
+            "metrics": {m.name: m.snapshot() for m in self.metrics()},
+        }
+
+    def to_prometheus(self):
+        lines = []
+        for m in self.metrics():
+            if m.help:
+                lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            if isinstance(m, Histogram):
+                for bound, seen in m.cumulative_buckets():
+                    lines.append(f'{m.name}_bucket{{le="{bound:.9g}"}} {seen}')
+                lines.append(f'{m.name}_bucket{{le="+Inf"}} {m.count}')
+                lines.append(f"{m.name}_sum {m.sum:.9g}")
+                lines.append(f"{m.name}_count {m.count}")
+            else:
+                lines.append(f"{m.name} {m.value:.9g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, filename):
+        _write_atomic(filename, self.to_prometheus())
+        return filename
+
+    def write_json(self, filename):
+        _write_atomic(filename, json.dumps(self.snapshot(), indent=2))
+        return filename
+
+
+def _write_atomic(filename, text):
+    """
+    Write to a temp file next to 'filename', then rename it over the target,
+    so a scraper reading during the (per-second) rewrite never sees a
+    truncated file.
+    """
+    tmp = filename + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, filename)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+# Process-wide registry fed by the reader, run loop, log writer and exporter
+REGISTRY = MetricsRegistry()
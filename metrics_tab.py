@@ -0,0 +1,90 @@
+import time
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from metrics import REGISTRY
+
+
+class MetricsTab:
+    REFRESH_MS = 1000  # ms between status panel refreshes
+
+    def __init__(self, notebook, registry=REGISTRY):
+        self.frame = ttk.Frame(notebook)
+        self.registry = registry
+        self._last_values = {}   # counter name -> (value, timestamp), for rates
+        self.prom_path = None     # last Prometheus export, rewritten when auto-export is on
+        self.auto_export = tk.BooleanVar(value=False)
+
+        # --- Buttons ---
+        bf = ttk.Frame(self.frame)
+        bf.pack(fill="x")
+        ttk.Button(bf, text="Export Prometheus", command=self.export_prometheus).pack(side="left", padx=5, pady=5)
+        ttk.Button(bf, text="Export JSON", command=self.export_json).pack(side="left", padx=5, pady=5)
+        ttk.Checkbutton(
+            bf, text="Rewrite Prometheus file every refresh", variable=self.auto_export
+        ).pack(side="left", padx=5, pady=5)
+
+        # --- Metrics table ---
+        cols = ("name", "type", "value", "rate_per_s", "count", "p50", "p90", "p99", "max")
+        self.tree = ttk.Treeview(self.frame, columns=cols, show="headings")
+        for c in cols:
+            self.tree.heading(c, text=c)
+            self.tree.column(c, width=220 if c == "name" else 90, stretch=True)
+        self.tree.pack(fill="both", expand=True)
+
+        self._rows = {}   # metric name -> tree item
+        self.frame.after(self.REFRESH_MS, self._refresh)
+
+    def _refresh(self):
+        now = time.perf_counter()
+        for m in self.registry.metrics():
+            snap = m.snapshot()
+            if snap["type"] == "histogram":
+                values = (
+                    m.name, "histogram", "", "", snap["count"],
+                    _fmt(snap["p50"]), _fmt(snap["p90"]), _fmt(snap["p99"]), _fmt(snap["max"]),
+                )
+            else:
+                rate = ""
+                if snap["type"] == "counter":
+                    prev = self._last_values.get(m.name)
+                    if prev and now > prev[1]:
+                        rate = _fmt((snap["value"] - prev[0]) / (now - prev[1]))
+                    self._last_values[m.name] = (snap["value"], now)
+                values = (m.name, snap["type"], _fmt(snap["value"]), rate, "", "", "", "", "")
+
+            item_id = self._rows.get(m.name)
+            if item_id is None:
+                self._rows[m.name] = self.tree.insert("", "end", values=values)
+            else:
+                self.tree.item(item_id, values=values)
+
+        if self.auto_export.get() and self.prom_path:
+            try:
+                self.registry.write_prometheus(self.prom_path)
+            except OSError:
+                self.auto_export.set(False)
+                messagebox.showerror("Export Failed", f"Could not write {self.prom_path}")
+
+        self.frame.after(self.REFRESH_MS, self._refresh)
+
+    # --- Export ---
+    def export_prometheus(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".prom", filetypes=[("Prometheus text","*.prom")])
+        if not file_path:
+            return
+        self.registry.write_prometheus(file_path)
+        self.prom_path = file_path
+        messagebox.showinfo("Exported", f"Metrics saved to {file_path}")
+
+    def export_json(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files","*.json")])
+        if not file_path:
+            return
+        self.registry.write_json(file_path)
+        messagebox.showinfo("Exported", f"Metrics saved to {file_path}")
+
+
+def _fmt(value):
+    if isinstance(value, int):
+        return str(value)
+    return f"{value:.4g}"
@@ -0,0 +1,329 @@
+import os
+import re
+import ast
+import json
+
+# Optional per-step control fields (not sent to the device)
+CONTROL_COLS = ("params", "loop", "when")
+
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_]\w*)\}")
+_LOOP_SPEC = re.compile(r"^\s*(\w+)\s*=\s*(-?\d+)\s*:\s*(-?\d+)\s*(?::\s*(-?\d+)\s*)?$")
+_INT_TEXT = re.compile(r"^\s*[+-]?\d+\s*$")
+_DECIMAL_TEXT = re.compile(r"^\s*[+-]?(\d+\.\d*|\.\d+)\s*$")
+
+# abs_path -> (mtime, rows); an entry is replaced when its file changes
+_table_cache = {}
+
+
+# --- Parameter tables ---
+def load_param_table(path):
+    """
+    Load a parameter table from CSV (header row = column names) or JSON
+    (list of objects, or object of equal-length column lists).
+    Returns a list of dicts with string values.
+    """
+    abs_path = os.path.abspath(path)
+    mtime = os.path.getmtime(abs_path)
+    cached = _table_cache.get(abs_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    if abs_path.lower().endswith(".csv"):
+        import csv
+        with open(abs_path, "r", encoding="utf-8", newline="") as f:
+            rows = [dict(r) for r in csv.DictReader(f)]
+    else:
+        with open(abs_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            cols = list(data)
+            if any(not isinstance(data[c], list) for c in cols):
+                raise ValueError("JSON object tables must map column names to lists.")
+            rows = [dict(zip(cols, vals)) for vals in zip(*(data[c] for c in cols))]
+        elif isinstance(data, list):
+            rows = data
+        else:
+            raise ValueError("JSON table root must be a list or an object.")
+
+    table = []
+    for r in rows:
+        if not isinstance(r, dict):
+            raise ValueError(f"{os.path.basename(path)}: every row must be an object.")
+        table.append({str(k).strip(): "" if v is None else str(v) for k, v in r.items()})
+    if not table:
+        raise ValueError(f"{os.path.basename(path)}: table is empty.")
+
+    _table_cache[abs_path] = (mtime, table)
+    return table
+
+
+def table_name(path):
+    """Name a table is referenced by in a step's 'params' column (file stem)."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def parse_loop(spec):
+    """
+    Parse a 'loop' column such as "band=1:21" or "ch=0:10:2; slot=1:3"
+    into a list of (name, range). Stop is exclusive, like range().
+    """
+    loops = []
+    for part in (spec or "").split(";"):
+        if not part.strip():
+            continue
+        m = _LOOP_SPEC.match(part)
+        if not m:
+            raise ValueError(f"Invalid loop '{part.strip()}' (use name=start:stop[:step]).")
+        name, start, stop, step = m.groups()
+        step = int(step or "1")
+        if step == 0:
+            raise ValueError(f"Invalid loop '{part.strip()}': step cannot be 0.")
+        loops.append((name, range(int(start), int(stop), step)))
+    return loops
+
+
+# --- Templating ---
+def render(text, bindings):
+    """Replace {name} placeholders that have a binding; leave others (e.g. regex {3}) alone."""
+    if not bindings or "{" not in text:
+        return text
+    return _PLACEHOLDER.sub(
+        lambda m: str(bindings[m.group(1)]) if m.group(1) in bindings else m.group(0), text
+    )
+
+
+def render_step(step, bindings):
+    """Return a copy of the step with placeholders substituted and control fields removed."""
+    return {
+        k: render(v, bindings) if isinstance(v, str) else v
+        for k, v in step.items() if k not in CONTROL_COLS
+    }
+
+
+# --- Conditions ---
+_CMP_OPS = {
+    ast.Eq: lambda a, b: a == b,
+    ast.NotEq: lambda a, b: a != b,
+    ast.Lt: lambda a, b: a < b,
+    ast.LtE: lambda a, b: a <= b,
+    ast.Gt: lambda a, b: a > b,
+    ast.GtE: lambda a, b: a >= b,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+_BIN_OPS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Mod: lambda a, b: a % b,
+    ast.FloorDiv: lambda a, b: a // b,
+}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _coerce(value):
+    """Number for numeric-looking text (plain integers/decimals only, so "nan" stays text)."""
+    if isinstance(value, str):
+        if _INT_TEXT.match(value):
+            return int(value)
+        if _DECIMAL_TEXT.match(value):
+            return float(value)
+    return value
+
+
+def _pair(a, b):
+    """
+    Table values are text; convert one only when the other operand is a
+    number, so mnc == "01" compares as text while band > 3 compares numerically.
+    """
+    if isinstance(a, str) and _is_number(b):
+        a = _coerce(a)
+    elif isinstance(b, str) and _is_number(a):
+        b = _coerce(b)
+    return a, b
+
+
+def _compare(op, a, b):
+    if op in (ast.In, ast.NotIn) and isinstance(b, tuple):
+        found = any(x == y for x, y in (_pair(a, item) for item in b))
+        return found if op is ast.In else not found
+    return _CMP_OPS[op](*_pair(a, b))
+
+
+def _eval_node(node, env):
+    if isinstance(node, ast.Expression):
+        return _eval_node(node.body, env)
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id not in env:
+            raise ValueError(f"Unknown name '{node.id}' in condition.")
+        return env[node.id]
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return tuple(_eval_node(e, env) for e in node.elts)
+    if isinstance(node, ast.BoolOp):
+        values = (_eval_node(v, env) for v in node.values)
+        return all(values) if isinstance(node.op, ast.And) else any(values)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+        val = _eval_node(node.operand, env)
+        return (not val) if isinstance(node.op, ast.Not) else -_coerce(val)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+        left, right = _pair(_eval_node(node.left, env), _eval_node(node.right, env))
+        return _BIN_OPS[type(node.op)](left, right)
+    if isinstance(node, ast.Compare):
+        left = _eval_node(node.left, env)
+        for op, comp in zip(node.ops, node.comparators):
+            if type(op) not in _CMP_OPS:
+                raise ValueError(f"Unsupported expression in condition: {type(op).__name__}")
+            right = _eval_node(comp, env)
+            if not _compare(type(op), left, right):
+                return False
+            left = right
+        return True
+    raise ValueError(f"Unsupported expression in condition: {type(node).__name__}")
+
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.Constant, ast.Name, ast.Load, ast.Tuple, ast.List,
+    ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.BinOp, ast.Compare,
+) + tuple(_BIN_OPS) + tuple(_CMP_OPS)
+
+
+def parse_condition(expr):
+    """
+    Parse and check a 'when' expression up front; returns None when empty.
+    Raises ValueError for syntax errors and unsupported constructs.
+    """
+    if not (expr or "").strip():
+        return None
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid condition '{expr}': {e.msg}")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported expression in condition: {type(node).__name__}")
+    return tree
+
+
+def evaluate_condition(expr, env):
+    """
+    Evaluate a 'when' expression such as  band % 2 == 0 and last_result == "PASS".
+    Only names, literals, comparisons, and/or/not and basic arithmetic are allowed.
+    'expr' may be text or a tree from parse_condition().
+    """
+    tree = parse_condition(expr) if expr is None or isinstance(expr, str) else expr
+    if tree is None:
+        return True
+    return bool(_eval_node(tree, env))
+
+
+# --- Expansion ---
+def _resolve_tables(spec, tables, base_dir=None):
+    """Look refs up in 'tables' by name, else load them as paths relative to base_dir."""
+    resolved = []
+    for ref in (spec or "").split(";"):
+        ref = ref.strip()
+        if not ref:
+            continue
+        if ref in tables:
+            resolved.append(tables[ref])
+        else:
+            path = os.path.join(base_dir, ref) if base_dir else ref
+            resolved.append(load_param_table(path))
+    return resolved
+
+
+def _bindings(table_list, loops):
+    """Lazily yield merged binding dicts over the cross product of tables and loops."""
+    # (None, rows) merges a table row; (name, range) binds one loop variable.
+    # Tables are already in memory and ranges can be re-iterated, so the
+    # recursion buffers nothing, unlike itertools.product's tuple copies.
+    axes = [(None, rows) for rows in table_list] + list(loops)
+    return _product(axes, 0, {})
+
+
+def _product(axes, index, partial):
+    if index == len(axes):
+        yield dict(partial)
+        return
+    name, values = axes[index]
+    for value in values:
+        if name is None:
+            bound = {**partial, **value}
+        else:
+            bound = {**partial, name: value}
+        yield from _product(axes, index + 1, bound)
+
+
+def _table_columns(table_list):
+    columns = set()
+    for rows in table_list:
+        for row in rows:
+            columns.update(row)
+    return columns
+
+
+def _check_placeholders(step, bound_names):
+    unbound = sorted(set(_PLACEHOLDER.findall(step.get("command", ""))) - bound_names)
+    if unbound:
+        names = ", ".join("{" + n + "}" for n in unbound)
+        raise ValueError(
+            f"Step '{step.get('command_name', '')}': command uses {names}, "
+            "which no parameter table column or loop variable provides."
+        )
+
+
+def _check_numeric(rendered):
+    """Catch bad retries/wait_till here, not as int()/float() errors in the run worker."""
+    for field, cast in (("retries", int), ("wait_till", float)):
+        value = rendered.get(field, "")
+        if not value:
+            continue
+        try:
+            cast(value)
+        except (TypeError, ValueError):
+            raise ValueError(
+                f"Step '{rendered.get('command_name', '')}': {field} '{value}' is not a number."
+            )
+
+
+def expand_plan(steps, iterations, tables=None, plan_params="", context=None, base_dir=None):
+    """
+    Lazily expand a plan into (iteration, rendered_step, bindings) tuples.
+
+    - tables: {name: rows} loaded up front (e.g. from the Run tab)
+    - plan_params: ';'-separated table names swept around the whole step list
+    - step 'params' / 'loop': per-step sweeps (cross product of both);
+      relative table paths are resolved against base_dir (the plan's folder)
+    - step 'when': condition checked against the bindings plus 'iteration'
+      and the current values in 'context' (e.g. last_result), which the
+      caller may update between steps.
+    """
+    tables = tables or {}
+    context = context if context is not None else {}
+
+    # Validate every control field when the generator first runs, i.e.
+    # before the caller takes (and sends) the first step
+    step_loops = [parse_loop(s.get("loop", "")) for s in steps]
+    step_conditions = [parse_condition(s.get("when", "")) for s in steps]
+    plan_tables = _resolve_tables(plan_params, tables, base_dir)
+    plan_columns = _table_columns(plan_tables)
+    for s, loops in zip(steps, step_loops):
+        step_columns = _table_columns(_resolve_tables(s.get("params", ""), tables, base_dir))
+        _check_placeholders(s, plan_columns | step_columns | {name for name, _ in loops})
+
+    for it in range(1, iterations + 1):
+        for outer in _bindings(plan_tables, []):
+            for step, loops, condition in zip(steps, step_loops, step_conditions):
+                for inner in _bindings(_resolve_tables(step.get("params", ""), tables, base_dir), loops):
+                    bindings = {**outer, **inner}
+                    env = {**context, **bindings, "iteration": it}
+                    if not evaluate_condition(condition, env):
+                        continue
+                    rendered = render_step(step, bindings)
+                    _check_numeric(rendered)
+                    yield it, rendered, bindings
@@ -0,0 +1,166 @@
+import os
+import threading
+from metrics import REGISTRY
+
+SCAN_SECONDS = REGISTRY.histogram("port_scan_seconds", "Time taken by one comports() enumeration")
+
+
+class PortScanner:
+    """
+    Enumerates serial ports on a background thread and caches the result,
+    so slow comports() calls (many USB/Bluetooth ports) never block Tk.
+    Readers compare 'version' to notice changes instead of rescanning.
+    Automatic rescans are paused while a port is connected (set_auto), so
+    long runs carry no background enumeration load; refresh() still works.
+    """
+    REFRESH_S = 3.0  # seconds between automatic rescans while idle
+
+    def __init__(self, refresh_s=None):
+        self.refresh_s = refresh_s or self.REFRESH_S
+        self.ports = []            # list of serial.tools.list_ports ListPortInfo
+        self.version = 0           # bumped whenever the device list changes
+        self.scanned = False       # True once the first scan has finished
+        self.available = True      # False if pyserial is not installed
+        self.auto = True           # periodic rescans; off while connected
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._scan_loop, name="port-scanner", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop = True
+        self._wake.set()
+
+    def refresh(self):
+        """Request an immediate rescan (returns at once)."""
+        self._wake.set()
+
+    def rescan(self):
+        """Enumerate now on the calling thread (blocks); returns the fresh port list."""
+        try:
+            from serial.tools import list_ports
+        except ImportError:
+            return self.port_infos()
+        self._scan_once(list_ports)
+        return self.port_infos()
+
+    def set_auto(self, enabled):
+        """Turn periodic rescans on or off; turning them on rescans at once."""
+        self.auto = enabled
+        if enabled:
+            self._wake.set()
+
+    def devices(self):
+        with self._lock:
+            return [p.device for p in self.ports]
+
+    def port_infos(self):
+        with self._lock:
+            return list(self.ports)
+
+    def _scan_loop(self):
+        try:
+            from serial.tools import list_ports
+        except ImportError:
+            self.available = False
+            self.scanned = True
+            self.version += 1
+            return
+
+        while not self._stop:
+            self._scan_once(list_ports)
+            # Without auto rescans, sleep until refresh()/set_auto()/stop()
+            self._wake.wait(self.refresh_s if self.auto else None)
+            self._wake.clear()
+
+
+    def _scan_once(self, list_ports):
+        try:
+            with SCAN_SECONDS.time():
+                found = sorted(list_ports.comports(), key=lambda p: p.device)
+        except Exception:
+            return
+        with self._lock:
+            changed = [p.device for p in found] != [p.device for p in self.ports]
+            self.ports = found
+            if changed or not self.scanned:
+                self.version += 1
+            self.scanned = True
+
+
+class PortMonitor:
+    """
+    Tracks one connected adapter by device path and VID:PID (+ serial number).
+    Presence checks only stat the device node on POSIX, so polling never
+    triggers a rescan. Elsewhere they read the scanner's cache, which is
+    only refreshed on demand while connected; there, a drop is detected by
+    read/write errors and the reconnect loop refreshes the cache.
+    """
+
+    def __init__(self, scanner, device):
+        self.scanner = scanner
+        self.device = device
+        ports = scanner.port_infos()
+        info = next((p for p in ports if p.device == device), None)
+        # Ports that existed at connect time; an identical adapter among them
+        # (same VID:PID, no serial number) is another DUT, never a candidate
+        self.known_devices = {p.device for p in ports}
+        self.vid = getattr(info, "vid", None)
+        self.pid = getattr(info, "pid", None)
+        self.serial_number = getattr(info, "serial_number", None)
+
+    def describe(self):
+        if self.vid is None:
+            return self.device
+        return f"{self.device} ({self.vid:04X}:{self.pid:04X})"
+
+    def is_present(self):
+        if os.name == "posix" and self.device.startswith("/dev/"):
+            return os.path.exists(self.device)
+        return self.device in self.scanner.devices()
+
+    def locate(self):
+        """
+        Device path to try reconnecting to, or None if the adapter has not
+        reappeared. Does not switch paths; call adopt() once a connect works.
+        Rescans synchronously, so call it from the reconnect thread only.
+        """
+        present = self.is_present()
+        if self.vid is None:
+            # Nothing to identify the adapter by; the path is all we have
+            return self.device if present else None
+        ports = self.scanner.rescan()
+        if present:
+            # Another adapter may have taken the old path (e.g. a second
+            # dongle enumerated as ttyUSB0 while ours was unplugged)
+            info = next((p for p in ports if p.device == self.device), None)
+            if info is not None and self._same_adapter(info):
+                return self.device
+        # Adapter may come back under a new path (e.g. ttyUSB0 -> ttyUSB1):
+        # accept a matching serial number anywhere, otherwise only a port
+        # with the same VID:PID that did not exist at connect time
+        for p in ports:
+            if p.device == self.device or not self._same_adapter(p):
+                continue
+            if self.serial_number or p.device not in self.known_devices:
+                return p.device
+        return None
+
+    def _same_adapter(self, info):
+        """Serial number match if ours has one, else the same VID:PID."""
+        if self.serial_number:
+            return getattr(info, "serial_number", None) == self.serial_number
+        return (getattr(info, "vid", None), getattr(info, "pid", None)) == (self.vid, self.pid)
+
+    def adopt(self, device):
+        """Follow the adapter to 'device' after a successful reconnect there."""
+        if device != self.device:
+            self.known_devices.discard(self.device)
+            self.device = device
+        self.known_devices.add(device)
@@ -0,0 +1,285 @@
+import os
+import io
+import re
+import sys
+import time
+import threading
+import contextlib
+
+# Files whose functions are called out separately in the report
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Top frames that mean "blocked, not working" where per-thread CPU clocks are
+# unavailable (Windows/macOS): (file basename, function)
+IDLE_FRAMES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("selectors.py", "select"), ("__init__.py", "mainloop"),
+    ("serialposix.py", "read"), ("serialwin32.py", "read"),
+}
+
+_active = None   # RunProfiler for the current run, or None
+_last = None     # most recently finished RunProfiler, for after-run addenda (export)
+
+
+def active():
+    return _active
+
+
+def stage(name):
+    """Time a block under 'name' if a profiling run is active; near-free otherwise."""
+    p = _active
+    return p.stage(name) if p else contextlib.nullcontext()
+
+
+def record(name, wall, cpu):
+    """Add an already-measured block to the active run's stage totals."""
+    p = _active
+    if p:
+        p.record(name, wall, cpu)
+
+
+def record_after_run(name, wall, cpu):
+    """
+    Record work that may follow the run (HTML export): counted as a stage
+    while a run is active, else added to the last run's after-run addendum.
+    """
+    p = _active
+    if p:
+        p.record(name, wall, cpu)
+    elif _last:
+        _last.record(name, wall, cpu, addendum=True)
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "wall", "cpu")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(
+            self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu
+        )
+        return False
+
+
+class RunProfiler:
+    """
+    Per-run profiling session:
+    - per-stage wall/CPU totals (reader, matching, UI poll, log I/O, export)
+    - optional cProfile of the run worker thread
+    - optional statistical sampler over all other threads (sys._current_frames);
+      a thread's sample only counts when it was busy (its CPU clock advanced,
+      or its top frame is not a known wait), and percentages are per thread
+    """
+
+    def __init__(self, use_cprofile=True, use_sampler=True, sample_interval=0.01):
+        self.use_cprofile = use_cprofile
+        self.use_sampler = use_sampler
+        self.sample_interval = sample_interval
+
+        self._lock = threading.Lock()
+        self.stages = {}           # name -> [calls, wall_s, cpu_s], within the run window
+        self.addendum = {}         # same, for work recorded after finish()
+        self.samples = 0
+        self.self_hits = {}        # (thread, file, func, line) -> busy samples with frame on top
+        self.total_hits = {}       # (thread, file, func, line) -> busy samples with frame on stack
+        self.thread_ticks = {}     # thread name -> samples the thread was alive for
+        self.thread_hits = {}      # thread name -> busy samples
+        self._cprofile = None
+        self._sampler = None
+        self._sampling = False
+        self.started = None
+        self.finished = None
+        self._start_wall = None
+        self._elapsed = None
+
+    # --- Lifecycle ---
+    def start(self):
+        global _active
+        self.started = time.time()
+        self._start_wall = time.perf_counter()
+        if self.use_sampler:
+            self._sampling = True
+            self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+        _active = self
+        return self
+
+    def finish(self):
+        """
+        End the run window: stop the sampler and stage collection. Only
+        record_after_run() (export) still reaches this profiler, into the addendum.
+        """
+        global _active, _last
+        if _active is self:
+            _active = None
+        _last = self
+        self._sampling = False
+        if self._sampler:
+            self._sampler.join(timeout=1.0)
+            self._sampler = None
+        self.finished = time.time()
+        self._elapsed = time.perf_counter() - self._start_wall
+
+    def stop(self):
+        global _active, _last
+        if self._sampling:
+            self.finish()
+        if _active is self:
+            _active = None
+        if _last is self:
+            _last = None
+
+    @contextlib.contextmanager
+    def profile_thread(self):
+        """cProfile the calling thread (the run worker) for the duration of the block."""
+        if not self.use_cprofile:
+            yield
+            return
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            self._cprofile = prof
+
+    # --- Collection ---
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def record(self, name, wall, cpu, addendum=False):
+        target = self.addendum if addendum else self.stages
+        with self._lock:
+            entry = target.get(name)
+            if entry is None:
+                target[name] = [1, wall, cpu]
+            else:
+                entry[0] += 1
+                entry[1] += wall
+                entry[2] += cpu
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        last_cpu = {}   # ident -> thread CPU time at the previous sample
+        while self._sampling:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                name = names.get(ident, str(ident))
+                busy = self._thread_busy(ident, frame, last_cpu)
+                self._record_stack(name, frame, busy)
+            self.samples += 1
+            time.sleep(self.sample_interval)
+
+    @staticmethod
+    def _thread_busy(ident, frame, last_cpu):
+        """Whether the thread ran since the last sample, rather than sleeping or waiting on I/O."""
+        try:
+            cpu = time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except (AttributeError, OSError, ValueError, OverflowError):
+            code = frame.f_code
+            return (os.path.basename(code.co_filename), code.co_name) not in IDLE_FRAMES
+        prev = last_cpu.get(ident)
+        last_cpu[ident] = cpu
+        return prev is not None and cpu > prev
+
+    def _record_stack(self, thread_name, frame, busy=True):
+        top = True
+        seen = set()
+        with self._lock:
+            self.thread_ticks[thread_name] = self.thread_ticks.get(thread_name, 0) + 1
+            if not busy:
+                return
+            self.thread_hits[thread_name] = self.thread_hits.get(thread_name, 0) + 1
+            while frame is not None:
+                code = frame.f_code
+                key = (thread_name, code.co_filename, code.co_name, code.co_firstlineno)
+                if top:
+                    self.self_hits[key] = self.self_hits.get(key, 0) + 1
+                    top = False
+                if key not in seen:
+                    seen.add(key)
+                    self.total_hits[key] = self.total_hits.get(key, 0) + 1
+                frame = frame.f_back
+
+    # --- Reporting ---
+    def report(self, top=25):
+        out = io.StringIO()
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started or time.time()))
+        elapsed = self._elapsed
+        if elapsed is None:
+            elapsed = time.perf_counter() - self._start_wall
+        out.write(f"Run profile (started {started}, {elapsed:.2f}s)\n\n")
+
+        out.write("== Per-stage timing ==\n")
+        out.write(f"{'stage':<22}{'calls':>10}{'wall_s':>12}{'cpu_s':>12}{'avg_ms':>10}{'%run':>8}\n")
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda kv: -kv[1][1])
+        for name, (calls, wall, cpu) in stages:
+            pct = 100.0 * wall / elapsed if elapsed else 0.0
+            out.write(f"{name:<22}{calls:>10}{wall:>12.3f}{cpu:>12.3f}{1000 * wall / calls:>10.3f}{pct:>8.1f}\n")
+
+        with self._lock:
+            addendum = sorted(self.addendum.items(), key=lambda kv: -kv[1][1])
+        if addendum:
+            out.write("\n== After run (not part of the run window) ==\n")
+            out.write(f"{'stage':<22}{'calls':>10}{'wall_s':>12}{'cpu_s':>12}{'avg_ms':>10}\n")
+            for name, (calls, wall, cpu) in addendum:
+                out.write(f"{name:<22}{calls:>10}{wall:>12.3f}{cpu:>12.3f}{1000 * wall / calls:>10.3f}\n")
+
+        if self.samples:
+            out.write(f"\n== Sampler ({self.samples} samples @ {self.sample_interval * 1000:.0f} ms) ==\n")
+            out.write("Only busy samples count; % is of that thread's samples.\n")
+            with self._lock:
+                ticks = dict(self.thread_ticks)
+                for name, n in sorted(ticks.items(), key=lambda kv: -self.thread_hits.get(kv[0], 0)):
+                    busy = self.thread_hits.get(name, 0)
+                    out.write(f"  thread {name}: busy {busy} of {n} ({100.0 * busy / n:.1f}%)\n")
+                self_hits = dict(self.self_hits)
+                total_hits = dict(self.total_hits)
+            out.write("\n-- Hot functions in this tool (cumulative %, self %) --\n")
+            ours = [
+                k for k in total_hits
+                if os.path.dirname(os.path.abspath(k[1])) == PACKAGE_DIR
+                and os.path.abspath(k[1]) != os.path.abspath(__file__)
+            ]
+            for key in sorted(ours, key=lambda k: -total_hits[k])[:top]:
+                out.write(self._fmt_hit(key, total_hits, self_hits, ticks))
+            out.write("\n-- Top functions overall by self samples --\n")
+            for key in sorted(self_hits, key=lambda k: -self_hits[k])[:top]:
+                out.write(self._fmt_hit(key, total_hits, self_hits, ticks))
+
+        if self._cprofile is not None:
+            import pstats
+            out.write("\n== cProfile: run worker thread (by cumulative time) ==\n")
+            stats = pstats.Stats(self._cprofile, stream=out)
+            stats.sort_stats("cumulative").print_stats(top)
+            out.write("== cProfile: this tool only (by internal time) ==\n")
+            stats.sort_stats("tottime").print_stats(re.escape(PACKAGE_DIR), top)
+        return out.getvalue()
+
+    def _fmt_hit(self, key, total_hits, self_hits, ticks):
+        thread_name, filename, func, line = key
+        n = ticks.get(thread_name) or 1
+        return (f"  {100.0 * total_hits.get(key, 0) / n:6.1f}% {100.0 * self_hits.get(key, 0) / n:6.1f}%"
+                f"  [{thread_name}] {os.path.basename(filename)}:{line} {func}\n")
+
+    def write_report(self, directory="."):
+        """Write profile_<timestamp>.txt (and .prof for cProfile viewers); return the text path."""
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.started or time.time()))
+        base = os.path.join(directory, f"profile_{stamp}")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(self.report())
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(base + ".prof")
+        return os.path.abspath(base + ".txt")
@@ -1,11 +1,28 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-import threading, time, re, queue
-from export_utils import export_to_html
+from tkinter import ttk, filedialog, messagebox
+import threading, time, re, queue, itertools
+from plan_utils import expand_plan, load_param_table, table_name
+from metrics import REGISTRY
+from profiler import RunProfiler, stage as profile_stage, record as profile_record
+
+SHARED_QUEUE_DEPTH = REGISTRY.gauge("shared_queue_depth", "Serial lines waiting for the UI poller")
+UI_QUEUE_DEPTH = REGISTRY.gauge("ui_queue_depth", "Log messages waiting for the UI poller")
+POLL_LAG = REGISTRY.histogram("ui_poll_lag_seconds", "How late the UI poller ran versus POLL_MS")
+POLL_SECONDS = REGISTRY.histogram("ui_poll_seconds", "Time spent draining queues per poll")
+LOG_LINES = REGISTRY.counter("log_lines_written_total", "Lines appended to the live log and session.log")
+LOG_WRITE_SECONDS = REGISTRY.histogram("log_write_seconds", "Time to append one line to session.log")
+COMMAND_SECONDS = REGISTRY.histogram("run_command_seconds", "Wall time per command including retries")
+RESPONSE_SECONDS = REGISTRY.histogram("run_response_seconds", "Time from send to a matching response")
+COMMANDS_PASSED = REGISTRY.counter("run_commands_passed_total", "Commands that passed")
+COMMANDS_FAILED = REGISTRY.counter("run_commands_failed_total", "Commands that failed")
+WRITE_ERRORS = REGISTRY.counter("run_write_errors_total", "Serial write failures in the run loop")
 
 
 class RunTab:
     POLL_MS = 100  # ms between checking the connection_tab queue
+    MAX_TREE_ROWS = 2000  # oldest finished rows are dropped beyond this
+    MAX_LINK_INTERRUPTIONS = 5  # failed writes per step retried without using an attempt
+    MAX_OUTAGE_S = 300  # a serial link down longer than this stops the run
 
     def __init__(self, notebook, editor_tab, connection_tab):
         self.frame = ttk.Frame(notebook)
@@ -15,6 +32,12 @@ class RunTab:
         self.stop_flag = False
         self.results = []
         self.iterations = tk.IntVar(value=1)
+        self.param_tables = {}             # name -> rows, from Load Params
+        self.sweep_var = tk.StringVar()    # tables swept around the whole plan
+        self.profile_var = tk.BooleanVar(value=False)
+        self.profiler = None
+        self.resume_event = threading.Event()   # cleared while the user has paused the run
+        self.resume_event.set()
 
         # queue for background-to-UI logging
         self.ui_queue = queue.Queue()
@@ -27,8 +50,16 @@ class RunTab:
         ttk.Button(bf, text="Run All", command=self.run_all).pack(side="left", padx=5)
         self.stop_button = ttk.Button(bf, text="Stop", command=self.stop, state="disabled")
         self.stop_button.pack(side="left", padx=5)
+        self.pause_button = ttk.Button(bf, text="Pause", command=self.toggle_pause, state="disabled")
+        self.pause_button.pack(side="left", padx=5)
         self.export_button = ttk.Button(bf, text="Export HTML", command=self.export_html, state="disabled")
         self.export_button.pack(side="left", padx=5)
+        ttk.Checkbutton(bf, text="Profile run", variable=self.profile_var).pack(side="left", padx=5)
+        ttk.Button(bf, text="Load Params", command=self.load_params).pack(side="left", padx=5)
+        ttk.Label(bf, text="Sweep:").pack(side="left")
+        ttk.Entry(bf, textvariable=self.sweep_var, width=20).pack(side="left", padx=5)
+        self.params_label = ttk.Label(bf, text="Tables: none")
+        self.params_label.pack(side="left", padx=5)
 
         # --- Results table ---
         cols = (
@@ -67,6 +98,7 @@ class RunTab:
         ttk.Button(search_frame, text="Find", command=self.search_log).pack(side="left")
 
         # Start polling
+        self._next_poll = time.perf_counter() + self.POLL_MS / 1000.0
         self.frame.after(self.POLL_MS, self._poll_queues)
 
     # --- Logging helpers ---
@@ -75,8 +107,10 @@ class RunTab:
         line = f"[{timestamp}] {msg}\n"
         self.log_text.insert("end", line)
         self.log_text.see("end")
-        with open("session.log", "a", encoding="utf-8") as f:
-            f.write(line)
+        with profile_stage("log.write"), LOG_WRITE_SECONDS.time():
+            with open("session.log", "a", encoding="utf-8") as f:
+                f.write(line)
+        LOG_LINES.inc()
 
     def enqueue_log(self, msg):
         self.ui_queue.put(msg)
@@ -95,6 +129,13 @@ class RunTab:
 
     # --- Poll queues ---
     def _poll_queues(self):
+        poll_start = time.perf_counter()
+        poll_cpu = time.thread_time()
+        POLL_LAG.observe(max(0.0, poll_start - self._next_poll))
+        UI_QUEUE_DEPTH.set(self.ui_queue.qsize())
+        if self.connection_tab and hasattr(self.connection_tab, "shared_queue"):
+            SHARED_QUEUE_DEPTH.set(self.connection_tab.shared_queue.qsize())
+
         try:
             while True:
                 msg = self.ui_queue.get_nowait()
@@ -112,6 +153,10 @@ class RunTab:
             except queue.Empty:
                 pass
 
+        done = time.perf_counter()
+        POLL_SECONDS.observe(done - poll_start)
+        profile_record("ui.poll", done - poll_start, time.thread_time() - poll_cpu)
+        self._next_poll = done + self.POLL_MS / 1000.0
         self.frame.after(self.POLL_MS, self._poll_queues)
 
     # --- Execution ---
@@ -122,57 +167,123 @@ class RunTab:
             messagebox.showerror("Not Connected", "Connect to a port first.")
             return
 
+        # The first next() validates every step's loop/params/when before anything is sent
+        self.plan_context = {"last_result": ""}
+        try:
+            plan = expand_plan(
+                [dict(cmd) for cmd in self.editor_tab.data], self.iterations.get(),
+                tables=self.param_tables, plan_params=self.sweep_var.get(),
+                context=self.plan_context, base_dir=self.editor_tab.plan_dir,
+            )
+            first = next(plan, None)
+        except Exception as e:
+            messagebox.showerror("Invalid Plan", str(e))
+            return
+        if first is None:
+            messagebox.showerror("Empty Plan", "No commands to run.")
+            return
+
         self.results.clear()
         for r in self.tree.get_children():
             self.tree.delete(r)
 
-        # preload all commands as pending (gray)
-        for it in range(1, self.iterations.get() + 1):
-            for cmd in list(self.editor_tab.data):
-                row_values = (
-                    it, cmd.get("command_name",""), cmd.get("command",""),
-                    cmd.get("expected",""), cmd.get("regex",""), cmd.get("negative",""),
-                    cmd.get("wait_till",""), cmd.get("print_after",""),
-                    cmd.get("print_ahead_chars",""), cmd.get("message",""),
-                    cmd.get("retries",""), "", "PENDING"
-                )
-                self.tree.insert("", "end", values=row_values, tags=("pending",))
-
         self.running = True
         self.stop_flag = False
         self.stop_button["state"] = "normal"
+        self.resume_event.set()
+        self.pause_button.config(text="Pause", state="normal")
         self.export_button["state"] = "disabled"  # reset disabled
 
-        threading.Thread(target=self._run_loop, daemon=True).start()
+        if self.profiler:
+            self.profiler.stop()
+        self.profiler = RunProfiler().start() if self.profile_var.get() else None
 
-    def _run_loop(self):
+        threading.Thread(
+            target=self._run_loop, args=(self._guard_plan(itertools.chain([first], plan)),),
+            daemon=True
+        ).start()
+
+    def _guard_plan(self, plan):
+        """Stop cleanly (instead of killing the worker) if a later step fails to expand."""
+        try:
+            yield from plan
+        except Exception as e:
+            self.enqueue_log(f"[ERROR] Plan stopped: {e}")
+
+    def load_params(self):
+        paths = filedialog.askopenfilenames(
+            filetypes=[("Parameter tables", "*.csv *.json"), ("All files", "*.*")]
+        )
+        if not paths:
+            return
+        try:
+            for path in paths:
+                self.param_tables[table_name(path)] = load_param_table(path)
+        except Exception as e:
+            messagebox.showerror("Load Failed", f"Could not load parameters: {e}")
+            return
+        summary = ", ".join(f"{n}({len(rows)})" for n, rows in self.param_tables.items())
+        self.params_label.config(text=f"Tables: {summary}")
+
+    def _add_row(self, it, cmd):
+        """Insert a RUNNING row for the step, dropping the oldest rows past MAX_TREE_ROWS."""
+        children = self.tree.get_children()
+        if len(children) >= self.MAX_TREE_ROWS:
+            self.tree.delete(*children[:len(children) - self.MAX_TREE_ROWS + 1])
+        row_values = (
+            it, cmd.get("command_name",""), cmd.get("command",""),
+            cmd.get("expected",""), cmd.get("regex",""), cmd.get("negative",""),
+            cmd.get("wait_till",""), cmd.get("print_after",""),
+            cmd.get("print_ahead_chars",""), cmd.get("message",""),
+            cmd.get("retries",""), "", "RUNNING"
+        )
+        item_id = self.tree.insert("", "end", values=row_values, tags=("running",))
+        self.tree.see(item_id)
+        return item_id, list(row_values)
+
+    def _run_loop(self, plan):
+        profiler = self.profiler
+        try:
+            if profiler is None:
+                self._execute_plan(plan)
+            else:
+                with profiler.profile_thread():
+                    self._execute_plan(plan)
+        except Exception as e:
+            self.enqueue_log(f"[ERROR] Run aborted: {e}")
+        finally:
+            # Always end the run, even if the worker failed, so the tab is not
+            # left "running" and the profiler stops sampling
+            if profiler is not None:
+                profiler.finish()
+                self._write_profile_report()
+            self.running = False
+            self.frame.after(0, lambda: self.stop_button.config(state="disabled"))
+            self.frame.after(0, lambda: self.pause_button.config(text="Pause", state="disabled"))
+            self.enqueue_log("[INFO] Test execution finished.")
+
+    def _write_profile_report(self):
+        try:
+            path = self.profiler.write_report()
+            self.enqueue_log(f"[PROFILE] Report written to {path}")
+        except OSError as e:
+            self.enqueue_log(f"[ERROR] Could not write profile report: {e}")
+
+    def _execute_plan(self, plan):
         conn = self.connection_tab
         first_command_done = False
 
-        # iterate through all rows in order
-        items = self.tree.get_children()
-        for idx, item_id in enumerate(items, 1):
+        # steps are expanded one at a time; rows are only created as they run
+        for it, cmd, bindings in plan:
             if self.stop_flag:
                 break
 
-            values = list(self.tree.item(item_id, "values"))
-            it = values[0]
-            cmd = {
-                "command_name": values[1],
-                "command": values[2],
-                "expected": values[3],
-                "regex": values[4],
-                "negative": values[5],
-                "wait_till": values[6],
-                "print_after": values[7],
-                "print_ahead_chars": values[8],
-                "message": values[9],
-                "retries": values[10],
-            }
-
             self.enqueue_log(f"[DEBUG] Starting command: {cmd['command_name']} ({cmd['command']})")
-            self.tree.item(item_id, tags=("running",))
-            self.tree.set(item_id, "result", "RUNNING")
+            if bindings:
+                self.enqueue_log(f"[DEBUG] Params: {bindings}")
+            with profile_stage("run.ui_update"):
+                item_id, values = self._add_row(it, cmd)
+            command_start = time.perf_counter()
 
             retries = int(cmd.get("retries", "1") or "1")
             if retries < 1:
@@ -181,17 +292,27 @@ class RunTab:
             final_result = "FAIL"
             found_text = ""
 
-            for attempt in range(retries):
-                if self.stop_flag:
+            attempt = 0
+            interruptions = 0
+            while attempt < retries:
+                if not self._wait_until_ready(conn):
                     break
 
                 command = cmd.get("command", "")
                 self.enqueue_log(f"[SEND] {command} (attempt {attempt+1}/{retries})")
                 try:
-                    conn.serial_conn.write((command + "\r\n").encode())
+                    with profile_stage("run.send"):
+                        conn.serial_conn.write((command + "\r\n").encode())
                 except Exception as e:
+                    WRITE_ERRORS.inc()
                     self.enqueue_log(f"[ERROR] {e}")
+                    conn.report_write_error(e)
+                    # Nothing was sent: retry this attempt once the link is back
+                    interruptions += 1
+                    if interruptions > self.MAX_LINK_INTERRUPTIONS:
+                        attempt += 1
                     continue
+                sent_at = time.perf_counter()
 
                 with conn.history_lock:
                     start_idx = len(conn.history)
@@ -203,33 +324,26 @@ class RunTab:
                 end_time = time.time() + timeout
                 success = False
                 while time.time() < end_time and not self.stop_flag:
+                    if not conn.is_connected():
+                        # The command was sent (it may itself have reset the
+                        # adapter, e.g. AT+CFUN=1,1): never resend it. Wait for
+                        # the reconnect, then judge this attempt on what arrives.
+                        outage_start = time.time()
+                        if not self._wait_until_ready(conn):
+                            break
+                        end_time += time.time() - outage_start
+                        continue
                     with conn.history_lock:
                         new_lines = conn.history[start_idx:]
                     if new_lines:
                         response = "\n".join(new_lines)
                         found_text = response.strip()
 
-                        expected = cmd.get("expected", "").strip()
-                        regex = cmd.get("regex", "").strip()
-                        negative = cmd.get("negative", "").strip()
-
-                        if regex:
-                            try:
-                                if re.search(regex, response, re.MULTILINE):
-                                    success = True
-                            except re.error as e:
-                                self.enqueue_log(f"[ERROR] Invalid regex: {e}")
-                        elif expected:
-                            if expected in response:
-                                success = True
-                        else:
-                            if response:
-                                success = True
-
-                        if negative and negative in response:
-                            success = False
+                        with profile_stage("run.match"):
+                            success = self._match_response(cmd, response)
 
                         if success:
+                            RESPONSE_SECONDS.observe(time.perf_counter() - sent_at)
                             final_result = "PASS"
                             break
                     time.sleep(0.05)
@@ -239,29 +353,103 @@ class RunTab:
 
                 if final_result == "PASS":
                     break
+                attempt += 1
+
+            COMMAND_SECONDS.observe(time.perf_counter() - command_start)
+            if final_result == "PASS":
+                COMMANDS_PASSED.inc()
+            else:
+                COMMANDS_FAILED.inc()
 
             # update row color + result
             values[11] = found_text
             values[12] = final_result
-            self.tree.item(item_id, values=values, tags=("pass" if final_result=="PASS" else "fail",))
+            with profile_stage("run.ui_update"):
+                self.tree.item(item_id, values=values, tags=("pass" if final_result=="PASS" else "fail",))
 
             self.enqueue_log(f"[{final_result}] {cmd['command_name']} (Retries {retries})")
             self.results.append({"iteration": it, **cmd, "found": found_text, "result": final_result})
+            self.plan_context["last_result"] = final_result
 
             if not first_command_done:
                 self.frame.after(0, lambda: self.export_button.config(state="normal"))
                 first_command_done = True
 
-        self.running = False
-        self.frame.after(0, lambda: self.stop_button.config(state="disabled"))
-        self.enqueue_log("[INFO] Test execution finished.")
+    def _match_response(self, cmd, response):
+        expected = cmd.get("expected", "").strip()
+        regex = cmd.get("regex", "").strip()
+        negative = cmd.get("negative", "").strip()
+
+        success = False
+        if regex:
+            try:
+                if re.search(regex, response, re.MULTILINE):
+                    success = True
+            except re.error as e:
+                self.enqueue_log(f"[ERROR] Invalid regex: {e}")
+        elif expected:
+            if expected in response:
+                success = True
+        else:
+            if response:
+                success = True
+
+        if negative and negative in response:
+            success = False
+        return success
+
+    def _wait_until_ready(self, conn):
+        """
+        Block while the user has paused the run or the serial link is down
+        (ConnectionTab is reconnecting). Returns False if the run was stopped,
+        the port was disconnected by the user, or the outage exceeded MAX_OUTAGE_S;
+        the last two also stop the run.
+        """
+        outage_start = None
+        while not self.stop_flag:
+            if not self.resume_event.is_set():
+                self.resume_event.wait(0.2)
+                continue
+            if conn.is_connected():
+                if outage_start is not None:
+                    self.enqueue_log("[RESUME] Serial link restored, continuing from current step.")
+                return True
+            if not conn.auto_reconnect:
+                self.enqueue_log("[STOP] Serial port disconnected; stopping run.")
+                self.stop_flag = True
+                break
+            if outage_start is None:
+                self.enqueue_log("[PAUSE] Serial link lost, waiting for reconnect...")
+                outage_start = time.time()
+            elif time.time() - outage_start > self.MAX_OUTAGE_S:
+                self.enqueue_log(
+                    f"[ERROR] Serial link down for over {self.MAX_OUTAGE_S}s; stopping run."
+                )
+                self.stop_flag = True
+                break
+            conn.link_up.wait(0.2)
+        return False
+
+    def toggle_pause(self):
+        if self.resume_event.is_set():
+            self.resume_event.clear()
+            self.pause_button.config(text="Resume")
+            self.enqueue_log("[PAUSE] Execution paused by user (before the next send).")
+        else:
+            self.resume_event.set()
+            self.pause_button.config(text="Pause")
+            self.enqueue_log("[RESUME] Execution resumed by user.")
 
     def stop(self):
         self.stop_flag = True
+        self.resume_event.set()
         self.enqueue_log("[STOP] Execution stopped by user.")
 
     def export_html(self):
         if not self.results:
             messagebox.showerror("No Results", "No results to export.")
             return
+        from export_utils import export_to_html
         export_to_html(self.results)
+        if self.profiler:
+            self._write_profile_report()